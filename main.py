@@ -1,18 +1,23 @@
+import gc
 import sys
 import worklang.lexer
 import worklang.parser
 import worklang.compiler
 import worklang.tempvm
 
-with open(sys.argv[1]) as inputf:
-    data = inputf.read()
+with open(sys.argv[1], "rb", buffering=1 << 16) as inputf:
+    data = inputf.read().decode("utf-8")
 
-tokens = worklang.lexer.Lexer().run(data)
+# the front end builds no cycles; collect again once the program runs
+gc.disable()
+
+tokens = worklang.lexer.Lexer().iter(data)
 
-# print(tokens)
 parser = worklang.parser.Parser()
 try:
     ast = parser.run(tokens)
+except worklang.lexer.LexerException:
+    raise
 except Exception as e:
     print(f"Parser error around token {parser.tok}")
     raise e from None
@@ -23,6 +28,8 @@ c.compile_module(ast)
 
 vfs = c.dump_vfs()
 
+gc.enable()
+
 vm = worklang.tempvm.VM()
 vm.add_modsource(worklang.tempvm.VirtualSource(vfs))
 
@@ -1,39 +1,64 @@
-from .parser import Node, CallNode, ConstNode, IdenNode, ModuleDeclNode, DiscardNode, BinOpNode, AnonProcDeclNode, AssignNode, ForNode, ReturnNode, AssignAndReturnNode, AttrNode, WhileNode, TagNode, UseNode, BinOpType
+from .parser import Node, NodeKind, CallNode, ConstNode, IdenNode, ModuleDeclNode, DiscardNode, BinOpNode, AnonProcDeclNode, AssignNode, ForNode, ReturnNode, AssignAndReturnNode, AttrNode, WhileNode, TagNode, UseNode, BinOpType
 import struct
+import functools
 from dataclasses import dataclass
+from typing import Any, Callable
 
 MAGIC = b"Wklg\00\01\02\03"
 
+_I32 = struct.Struct(">I").pack
+_I32S = struct.Struct(">i").pack
+_I16 = struct.Struct(">H").pack
+_F32 = struct.Struct("f").pack
+
+# whole instructions: opcode + operand(s)
+_PACK_BI = struct.Struct(">BI").pack
+_PACK_BH = struct.Struct(">BH").pack
+_PACK_Bi = struct.Struct(">Bi").pack
+_PACK_BBi = struct.Struct(">BBi").pack
+_PACK_BIB = struct.Struct(">BIB").pack
+
+def _enc_varint(i: int) -> bytes:
+    if i == 0:
+        return bytes((1, 0))
+    b = i.to_bytes((i.bit_length() + 8) // 8, "big", signed=True)
+    return bytes((len(b),)) + b
+
+_VARINT_SMALL = [_enc_varint(i) for i in range(-128, 256)]
+
+@functools.lru_cache(maxsize=4096)
+def _enc_str(s: str) -> bytes:
+    encoded = s.encode()
+    return _I32(len(encoded)) + encoded
+
 class Encoder:
     @classmethod
     def str(cls, s: str):
-        encoded = s.encode()
-        return cls.int32(len(encoded)) + encoded
+        return _enc_str(s)
     
     @classmethod
     def int32_signed(cls, i: int):
-        return i.to_bytes(4, "big", signed=True)
+        return _I32S(i)
 
     @classmethod
     def int32(cls, i: int):
-        return i.to_bytes(4, "big")
+        return _I32(i)
     @classmethod
     def int16(cls, i: int):
-        return i.to_bytes(2, "big")
+        return _I16(i)
     @classmethod
     def varint(cls, i: int):
-        if i == 0:
-            return bytearray([1, 0])
-        b = i.to_bytes((i.bit_length() + 8) // 8, "big", signed=True)
-        return bytearray([len(b), *b])
+        if -128 <= i < 256:
+            return _VARINT_SMALL[i + 128]
+        return _enc_varint(i)
 
     @classmethod
     def float(cls, f: float):
-        return struct.pack("f", f)
+        return _F32(f)
 
 @dataclass
 class RunnableEntry:
-    args: list[str]
+    args: list[str] | tuple[str, ...]
     bytecode: bytearray | bytes
 
 class ConstEntry:
@@ -42,6 +67,9 @@ class ConstEntry:
     STRING = 3
     RUNNABLE = 4
 
+_CONST_INT = bytes((ConstEntry.INT,))
+_CONST_STRING = bytes((ConstEntry.STRING,))
+
 class Opcodes:
     NOP = 0x00 # not used by compiler, but must be implemented in VM
     PUSH_CONST = 0x01
@@ -68,6 +96,7 @@ class Opcodes:
     JMP = 0x50
     JMP_IF = 0x51
 
+    HALT = 0x7E # not emitted by compiler: the VM appends it to every loaded body
     RETURN = 0x7F
     DISCARD = 0x80
 
@@ -76,14 +105,32 @@ CONST_TYPE = int | float | str | RunnableEntry
 class Module:
     def __init__(self):
         self.name: str | None = None
-        self.bytecode: bytearray | None = None
+        self.bytecode: bytes | None = None
         self.const_pool: list[CONST_TYPE] = []
+        self._const_index: dict[int | float | str, int] = {}
+        self._const_ops: dict[tuple[int, int | float | str], bytes] = {}
+        self._dumped: bytes | None = None
     
     def push_const(self, const: CONST_TYPE):
-        if const in self.const_pool:
-            return self.const_pool.index(const)
+        if isinstance(const, RunnableEntry):
+            # never shared: each one carries its own parent scope in the VM
+            self.const_pool.append(const)
+            return len(self.const_pool) - 1
+
+        i = self._const_index.get(const)
+        if i is not None:
+            return i
+        i = len(self.const_pool)
         self.const_pool.append(const)
-        return len(self.const_pool) - 1
+        self._const_index[const] = i
+        return i
+
+    def const_op(self, opcode: int, const: int | float | str):
+        key = (opcode, const)
+        code = self._const_ops.get(key)
+        if code is None:
+            code = self._const_ops[key] = _PACK_BI(opcode, self.push_const(const))
+        return code
 
     def set_name(self, name: str):
         self.name = name
@@ -93,32 +140,32 @@ class Module:
         return self.name
     
     def dump(self):
+        if self._dumped is not None:
+            return self._dumped
         assert self.bytecode is not None
         intro_runnable = self.push_const(RunnableEntry([], self.bytecode))
 
-        result = bytearray()
-
-        result.extend(Encoder.str(self.get_name()))        
-        result.extend(Encoder.int32(len(self.const_pool)))
+        parts: list[bytes | bytearray] = [Encoder.str(self.get_name()), Encoder.int32(len(self.const_pool))]
+        append = parts.append
         for entry in self.const_pool:
             if isinstance(entry, str):
-                result.append(ConstEntry.STRING)
-                result.extend(Encoder.str(entry))
+                append(_CONST_STRING)
+                append(Encoder.str(entry))
             elif isinstance(entry, int):
-                result.append(ConstEntry.INT)
-                result.extend(Encoder.varint(entry))
+                append(_CONST_INT)
+                append(Encoder.varint(entry))
             elif isinstance(entry, RunnableEntry):
-                result.append(ConstEntry.RUNNABLE)
-                result.append(len(entry.args))
+                append(bytes((ConstEntry.RUNNABLE, len(entry.args))))
                 for i in entry.args:
-                    result.extend(Encoder.str(i))
-                result.extend(Encoder.int32(len(entry.bytecode)))
-                result.extend(entry.bytecode)
+                    append(Encoder.str(i))
+                append(Encoder.int32(len(entry.bytecode)))
+                append(entry.bytecode)
             else:
                 raise NotImplementedError(f"Cannot serialize const pool entry {entry}")
 
-        result.extend(Encoder.int32(intro_runnable))
-        return result
+        append(Encoder.int32(intro_runnable))
+        self._dumped = b"".join(parts)
+        return self._dumped
 
 class Compiler:
     def __init__(self):
@@ -128,10 +175,7 @@ class Compiler:
 
     def compile_module(self, module_ast: list[Node]):
         self.module_stack.append(Module())
-        bytecode = bytearray()
-
-        for i in module_ast:
-            bytecode.extend(self.visit_node(i))
+        bytecode = b"".join([self.visit_node(i) for i in module_ast])
         mod = self.module_stack.pop()
 
         assert mod.get_name() not in self.module_cache
@@ -141,9 +185,9 @@ class Compiler:
 
         return mod
 
-    def visit_node(self, node: Node) -> bytearray:
-        return getattr(self, "visit_node_" + node.__class__.__name__, self.no_node_visitor)(node)
-    def no_node_visitor(self, node: Node) -> bytearray:
+    def visit_node(self, node: Node) -> bytes:
+        return self._DISPATCH[node.kind](self, node)
+    def no_node_visitor(self, node: Node) -> bytes:
         raise NotImplementedError(f"No visitor for node {node}")
     
     def visit_node_UseNode(self, node: UseNode):
@@ -157,59 +201,50 @@ class Compiler:
     def assign_node_setter(self, to: Node):
         assert isinstance(to, IdenNode), f"TODO {to}"
 
-        name_ptr = self.module_stack[-1].push_const(to.iden)
-
-        return bytearray([Opcodes.SET, *Encoder.int32(name_ptr)])
+        return self.module_stack[-1].const_op(Opcodes.SET, to.iden)
 
     def visit_node_AssignNode(self, node: AssignNode):
-        return bytearray([*self.visit_node(node.value), *self.assign_node_setter(node.to)])
+        return self.visit_node(node.value) + self.assign_node_setter(node.to)
 
     def visit_node_AttrNode(self, node: AttrNode):
-        attr_ptr = self.module_stack[-1].push_const(node.attr)
-        return bytearray([*self.visit_node(node.obj), Opcodes.GETATTR, *Encoder.int32(attr_ptr)])
+        getattr_op = self.module_stack[-1].const_op(Opcodes.GETATTR, node.attr)
+        return self.visit_node(node.obj) + getattr_op
 
     def visit_node_AssignAndReturnNode(self, node: AssignAndReturnNode):
-        return bytearray([*self.visit_node(node.value), Opcodes.DUP, *self.assign_node_setter(node.to)])
+        return self.visit_node(node.value) + bytes((Opcodes.DUP,)) + self.assign_node_setter(node.to)
 
     def visit_node_WhileNode(self, node: WhileNode):
-        body = b"".join(self.visit_node(x) for x in node.body)
-        intro = bytearray([*self.visit_node(node.cond), Opcodes.LOGICNOT, Opcodes.JMP_IF, *Encoder.int32_signed(len(body) + 5)])
-        outro = bytearray([Opcodes.JMP, *Encoder.int32_signed(-len(intro)-len(body)-5)])
-        return bytearray([*intro, *body, *outro])
+        body = b"".join([self.visit_node(x) for x in node.body])
+        intro = self.visit_node(node.cond) + _PACK_BBi(Opcodes.LOGICNOT, Opcodes.JMP_IF, len(body) + 5)
+        outro = _PACK_Bi(Opcodes.JMP, -len(intro)-len(body)-5)
+        return intro + body + outro
 
     def visit_node_ReturnNode(self, node: ReturnNode):
         if node.value is None:
-            return bytearray([Opcodes.PUSH_NIL, Opcodes.RETURN])
-        return bytearray([*self.visit_node(node.value), Opcodes.RETURN])
+            return bytes((Opcodes.PUSH_NIL, Opcodes.RETURN))
+        return self.visit_node(node.value) + bytes((Opcodes.RETURN,))
 
     def visit_node_ForNode(self, node: ForNode):
         assert False
-        return bytearray([])
+        return b""
 
     def visit_node_AnonProcDeclNode(self, node: AnonProcDeclNode):
-        bytecode = bytearray()
-
-        for i in node.body:
-            bytecode.extend(self.visit_node(i))
+        bytecode = b"".join([self.visit_node(i) for i in node.body])
 
         ptr_runnable = self.module_stack[-1].push_const(RunnableEntry(node.args, bytecode))
 
-        return bytearray([Opcodes.PUSH_CONST, *Encoder.int32(ptr_runnable), Opcodes.INJECT_PARENT_SCOPE])
+        return _PACK_BIB(Opcodes.PUSH_CONST, ptr_runnable, Opcodes.INJECT_PARENT_SCOPE)
 
     def visit_node_ModuleDeclNode(self, node: ModuleDeclNode):
         self.module_stack[-1].set_name(".".join(node.modname))
-        return bytearray()
+        return b""
 
     def visit_node_CallNode(self, node: CallNode):
-        result = bytearray()
-
-        for arg in node.args:
-            result.extend(self.visit_node(arg))
-        result.extend(self.visit_node(node.callee))
-        result.append(Opcodes.INVOKE)
-        result.extend(Encoder.int16(len(node.args)))
+        parts = [self.visit_node(arg) for arg in node.args]
+        parts.append(self.visit_node(node.callee))
+        parts.append(_PACK_BH(Opcodes.INVOKE, len(node.args)))
 
-        return result
+        return b"".join(parts)
     
     def visit_node_BinOpNode(self, node: BinOpNode):
         ops = {
@@ -217,22 +252,37 @@ class Compiler:
             BinOpType.Mul: Opcodes.MULTIPLY,
             BinOpType.Lt: Opcodes.LESSTHAN
         }
-        return bytearray([*self.visit_node(node.left), *self.visit_node(node.right), ops[node.op]])
+        return self.visit_node(node.left) + self.visit_node(node.right) + bytes((ops[node.op],))
 
     def visit_node_DiscardNode(self, node: DiscardNode):
-        return self.visit_node(node.value) + bytearray([Opcodes.DISCARD])
+        return self.visit_node(node.value) + bytes((Opcodes.DISCARD,))
     
     def visit_node_ConstNode(self, node: ConstNode):
-        ptr = self.module_stack[-1].push_const(node.value)
-
-        return bytearray([Opcodes.PUSH_CONST, *Encoder.int32(ptr)])
+        return self.module_stack[-1].const_op(Opcodes.PUSH_CONST, node.value)
     
     def visit_node_IdenNode(self, node: IdenNode):
-        ptr = self.module_stack[-1].push_const(node.iden)
-        return bytearray([Opcodes.GET, *Encoder.int32(ptr)])
+        return self.module_stack[-1].const_op(Opcodes.GET, node.iden)
+
+    # indexed by NodeKind
+    _DISPATCH: list[Callable[["Compiler", Any], bytes]] = [no_node_visitor] * (max(NodeKind) + 1)
+    _DISPATCH[NodeKind.Use] = visit_node_UseNode
+    _DISPATCH[NodeKind.Tag] = visit_node_TagNode
+    _DISPATCH[NodeKind.Assign] = visit_node_AssignNode
+    _DISPATCH[NodeKind.Attr] = visit_node_AttrNode
+    _DISPATCH[NodeKind.AssignAndReturn] = visit_node_AssignAndReturnNode
+    _DISPATCH[NodeKind.While] = visit_node_WhileNode
+    _DISPATCH[NodeKind.Return] = visit_node_ReturnNode
+    _DISPATCH[NodeKind.For] = visit_node_ForNode
+    _DISPATCH[NodeKind.AnonProcDecl] = visit_node_AnonProcDeclNode
+    _DISPATCH[NodeKind.ModuleDecl] = visit_node_ModuleDeclNode
+    _DISPATCH[NodeKind.Call] = visit_node_CallNode
+    _DISPATCH[NodeKind.BinOp] = visit_node_BinOpNode
+    _DISPATCH[NodeKind.Discard] = visit_node_DiscardNode
+    _DISPATCH[NodeKind.Const] = visit_node_ConstNode
+    _DISPATCH[NodeKind.Iden] = visit_node_IdenNode
 
     def dump_vfs(self):
-        vfs: dict[str, bytearray | bytes] = {}
+        vfs: dict[str, bytes] = {}
         
         for module in self.module_cache.values():
             vfs[module.get_name()] = module.dump()
@@ -1,3 +1,5 @@
+import re
+import sys
 import string
 import enum
 from typing import Any
@@ -8,11 +10,13 @@ CYRILLIC_NON_STANDARD = 'ёЁєЄіїІґҐ'
 
 CYRILLIC_LETTERS = CYRILLIC_LOWER + CYRILLIC_UPPER + CYRILLIC_NON_STANDARD
 ALL_LETTERS = string.ascii_letters + CYRILLIC_LETTERS + "_"
-ALL_LETTERS_DIGITS = ALL_LETTERS + string.digits
 
 WHITESPACE = " \t\r\n\v"
 
 class TokenType(enum.Enum):
+    # Enum's own __hash__ runs in Python on every table lookup
+    __hash__ = object.__hash__
+
     EOF = -1
     
     Identifier = 1
@@ -39,6 +43,8 @@ class TokenType(enum.Enum):
     InlineMul = 1101
 
 class Keyword(enum.Enum):
+    __hash__ = object.__hash__
+
     Use = "использовать"
     If = "если"
     Then = "тогда"
@@ -60,10 +66,24 @@ DOUBLES = {
 }
 DOUBLES_INIT = tuple(x[0][0] for x in DOUBLES.keys())
 
-KEYWORDS = list(x.value for x in Keyword)
-TOKENTYPES = list(x.value for x in TokenType)
+_TOKENTYPE_CHARS = {t.value: t for t in TokenType if isinstance(t.value, str)}
+_SINGLES = "".join(_TOKENTYPE_CHARS)
+_LETTERS_CLASS = "".join(re.escape(c) for c in ALL_LETTERS)
+_DOUBLES_PATTERN = "|".join(re.escape(k + v[0]) for k, v in DOUBLES.items())
+
+# leading whitespace is part of every match
+TOKEN_RE = re.compile(
+    f"[{re.escape(WHITESPACE)}]*(?:"
+    f"(?P<IDENT>[{_LETTERS_CLASS}][{_LETTERS_CLASS}0-9]*)"
+    r"|(?P<NUMBER>\d+)"
+    r"""|(?P<STRING>"[^"]*"|'[^']*')"""
+    f"|(?P<OP>{_DOUBLES_PATTERN}|[{re.escape(_SINGLES + ''.join(DOUBLES_INIT))}])"
+    f"|(?P<ERROR>[^{re.escape(WHITESPACE)}]))"
+)
 
 class Token:
+    __slots__ = ("type", "value")
+
     def __init__(self, token_type: TokenType, value: Any = None):
         self.type = token_type
         self.value = value
@@ -73,75 +93,56 @@ class Token:
             return f'Token({self.type}, {self.value})'
         return f'Token({self.type})'
 
+# terminates every token stream
+EOF_TOKEN = Token(TokenType.EOF)
+
+# these carry nothing but their type, so one instance each is shared
+_KEYWORD_TOKENS = {k.value: Token(TokenType.Keyword, k) for k in Keyword}
+_OP_TOKENS = {c: Token(t) for c, t in _TOKENTYPE_CHARS.items()}
+for _init, (_second, _single, _double) in DOUBLES.items():
+    _OP_TOKENS[_init] = Token(_single)
+    _OP_TOKENS[_init + _second] = Token(_double)
+
 class LexerException(Exception):
     pass
 
 class Lexer:
     def __init__(self):
-        pass
-
-    def next(self, step: int = 1):
-        self.idx += step
-        self.ch = self.text[self.idx] if self.idx < len(self.text) else None
+        self.idx = 0
 
     def run(self, data: str):
-        self.idx = -1
-        self.ch = None
-        self.text = data + "\n"
-
-        self.next()
-
-        tokens: list[Token] = []
-
-        while self.ch is not None:
-            if self.ch in WHITESPACE:
-                self.next()
-            elif self.ch in TOKENTYPES:
-                tokens.append(Token(TokenType(self.ch)))
-                self.next()
-            elif self.ch in ALL_LETTERS:
-                iden = ""
-                while self.ch in ALL_LETTERS_DIGITS:
-                    iden += self.ch
-                    self.next()
-
-                if iden.lower() in KEYWORDS:
-                    tokens.append(Token(TokenType.Keyword, Keyword(iden.lower())))
-                else:
-                    tokens.append(Token(TokenType.Identifier, iden))
-            elif self.ch.isdigit():
-                num = ""
-                while self.ch is not None and self.ch.isdigit():
-                    num += self.ch
-                    self.next()
-
-                tokens.append(Token(TokenType.Number, int(num)))
-            elif self.ch in "\"'":
-                quote = self.ch
-                self.next()
-
-                s = ""
-                while self.ch != quote:
-                    s += self.ch
-                    self.next()
-                self.next()
-
-                tokens.append(Token(TokenType.String, s))
-            elif self.ch in DOUBLES_INIT:
-                double = DOUBLES[self.ch]
-                self.next()
-                if self.ch == double[0]:
-                    self.next()
-                    tokens.append(Token(double[2]))
-                else:
-                    tokens.append(Token(double[1]))
+        return list(self.iter(data))
+
+    def iter(self, data: str):
+        keyword_tokens = _KEYWORD_TOKENS
+        op_tokens = _OP_TOKENS
+        intern = sys.intern
+        words: dict[str, Token] = {}
+
+        for m in TOKEN_RE.finditer(data):
+            kind = m.lastgroup
+            if kind == "IDENT":
+                iden = m.group(kind)
+                tok = words.get(iden)
+                if tok is None:
+                    tok = keyword_tokens.get(iden.lower())
+                    if tok is None:
+                        tok = Token(TokenType.Identifier, intern(iden))
+                    words[iden] = tok
+                yield tok
+            elif kind == "NUMBER":
+                yield Token(TokenType.Number, int(m.group(kind)))
+            elif kind == "STRING":
+                start, end = m.span(kind)
+                yield Token(TokenType.String, data[start + 1:end - 1])
+            elif kind == "OP":
+                yield op_tokens[m.group(kind)]
             else:
-                raise LexerException(f"Неизвестный символ '{self.ch}'")
-
-        return tokens
-    
-    def save(self):
-        return self.idx
-    def restore(self, idx: int):
-        self.idx = idx - 1
-        self.next()
\ No newline at end of file
+                self.idx = m.start(kind)
+                ch = m.group(kind)
+                if ch in "\"'":
+                    raise LexerException("Незакрытая строка")
+                raise LexerException(f"Неизвестный символ '{ch}'")
+
+        self.idx = len(data)
+        yield EOF_TOKEN
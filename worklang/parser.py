@@ -1,32 +1,75 @@
-from .lexer import TokenType, Token, Keyword
-from enum import Enum
+from .lexer import Lexer, TokenType, Token, Keyword, EOF_TOKEN
+from enum import Enum, IntEnum
+from dataclasses import dataclass
+import functools
+import hashlib
+from typing import Any, Callable, Iterable, Iterator, final
+
+class NodeKind(IntEnum):
+    Call = 1
+    Iden = 2
+    Const = 3
+    Discard = 4
+    ModuleDecl = 5
+    BinOp = 6
+    Return = 7
+    AnonProcDecl = 8
+    Assign = 9
+    For = 10
+    Use = 11
+    Attr = 12
+    Tag = 13
+    AssignAndReturn = 14
+    While = 15
+    DeclWrap = 16
 
 class Node:
+    __slots__ = ()
+
+    kind: NodeKind
+    _REPR_FIELDS: tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+        # runs again once dataclass(slots=True) has added the field slots
+        cls._REPR_FIELDS = tuple(cls.__dict__.get("__slots__", ()))
+
     def __repr__(self):
-        props = list(filter(lambda x: not x.startswith("__"), dir(self)))
-        pairs = list((f"{prop}={repr(getattr(self, prop))}" for prop in props))
-        return self.__class__.__name__ + f"({', '.join(pairs)})"
+        return f"{type(self).__name__}({', '.join(f'{s}={getattr(self, s)!r}' for s in self._REPR_FIELDS)})"
 
+# identity equality; Node.__repr__ renders the fields
+_node = functools.partial(dataclass, slots=True, repr=False, eq=False)
+
+@_node
 class CallNode(Node):
-    def __init__(self, callee: Node, args: list[Node]):
-        self.callee = callee
-        self.args = args
+    kind = NodeKind.Call
+
+    callee: Node
+    args: list[Node]
 
+@_node
 class IdenNode(Node):
-    def __init__(self, iden: str):
-        self.iden = iden
+    kind = NodeKind.Iden
 
+    iden: str
+
+@_node
 class ConstNode(Node):
-    def __init__(self, value: str | int | float | bool):
-        self.value = value
+    kind = NodeKind.Const
+
+    value: str | int | float | bool
 
+@_node
 class DiscardNode(Node):
-    def __init__(self, value: Node):
-        self.value = value
+    kind = NodeKind.Discard
 
+    value: Node
+
+@_node
 class ModuleDeclNode(Node):
-    def __init__(self, modname: list[str]):
-        self.modname = modname
+    kind = NodeKind.ModuleDecl
+
+    modname: list[str]
 
 class BinOpType(Enum):
     Add = 1
@@ -35,121 +78,150 @@ class BinOpType(Enum):
     Div = 4
     Lt = 5
 
+@_node
 class BinOpNode(Node):
-    def __init__(self, left: Node, op: BinOpType, right: Node):
-        self.left = left
-        self.op = op
-        self.right = right
+    kind = NodeKind.BinOp
 
+    left: Node
+    op: BinOpType
+    right: Node
+
+@_node
 class ReturnNode(Node):
-    def __init__(self, value: Node | None):
-        self.value = value
+    kind = NodeKind.Return
+
+    value: Node | None
 
+@_node
 class AnonProcDeclNode(Node):
-    def __init__(self, args: list[str], body: list[Node]):
-        self.args = args
-        self.body = body
+    kind = NodeKind.AnonProcDecl
+
+    args: tuple[str, ...]
+    body: list[Node]
 
+@_node
 class AssignNode(Node):
-    def __init__(self, to: Node, value: Node):
-        self.to = to
-        self.value = value
+    kind = NodeKind.Assign
 
+    to: Node
+    value: Node
+
+@_node
 class ForNode(Node):
-    def __init__(self, var: str, value: Node, body: list[Node]):
-        self.var = var
-        self.value = value
-        self.body = body
+    kind = NodeKind.For
+
+    var: str
+    value: Node
+    body: list[Node]
 
+@_node
 class UseNode(Node):
-    def __init__(self, name: list[str], as_name: str):
-        self.name = name
-        self.as_name = as_name
+    kind = NodeKind.Use
 
+    name: list[str]
+    as_name: str
+
+@_node
 class AttrNode(Node):
-    def __init__(self, obj: Node, attr: str):
-        self.obj = obj
-        self.attr = attr
+    kind = NodeKind.Attr
+
+    obj: Node
+    attr: str
 
+@_node
 class TagNode(Node):
-    def __init__(self, tag: str, value: Node | None):
-        self.tag = tag
-        self.value = value
+    kind = NodeKind.Tag
 
+    tag: str
+    value: Node | None
+
+@_node
 class AssignAndReturnNode(Node):
-    def __init__(self, to: Node, value: Node):
-        self.to = to
-        self.value = value
+    kind = NodeKind.AssignAndReturn
+
+    to: Node
+    value: Node
 
+@_node
 class WhileNode(Node):
-    def __init__(self, cond: Node, body: list[Node]):
-        self.cond = cond
-        self.body = body
+    kind = NodeKind.While
 
+    cond: Node
+    body: list[Node]
+
+@_node
 class DeclWrapNode(Node):
-    def __init__(self, value: Node):
-        self.value = value
+    kind = NodeKind.DeclWrap
+
+    value: Node
+
+_INLINE_OPS = {TokenType.InlineAdd: BinOpType.Add, TokenType.InlineMul: BinOpType.Mul}
+_ADD_OPS = {TokenType.Plus: BinOpType.Add}
+_MUL_OPS = {TokenType.Multiply: BinOpType.Mul}
+_CMP_OPS = {Keyword.LessThan: BinOpType.Lt}
 
 class ParserException(Exception):
     pass
 
+@final
 class Parser:
-    def __init__(self):
-        pass
+    __slots__ = ("tokens", "tok", "_scratch_args")
 
-    def next(self, step: int = 1):
-        self.idx += step
-        self.tok = self.tokens[self.idx] if self.idx < len(self.tokens) else Token(TokenType.EOF)
+    def __init__(self) -> None:
+        self.tokens: Iterator[Token] = iter(())
+        self.tok: Token = EOF_TOKEN
+        self._scratch_args: list[str] = []
 
-    def run(self, tokens: list[Token]):
-        self.tokens = tokens
-        self.idx = -1
-        self.tok = Token(TokenType.EOF)
+    def next(self) -> None:
+        self.tok = next(self.tokens, EOF_TOKEN)
+
+    def run(self, tokens: Iterable[Token]) -> list[Node]:
+        self.tokens = iter(tokens)
         self.next()
 
         body: list[Node] = []
-        while self.tok.type != TokenType.EOF:
+        while self.tok.type is not TokenType.EOF:
             body.append(self.root_statement())
         
         return body
 
-    def root_statement(self):
-        v = None
-        if self.tok.type == TokenType.Keyword:
-            if self.tok.value == Keyword.Module:
-                v = self.module_decl()
-            elif self.tok.value == Keyword.Use:
-                v = self.use()
-
-        if v is not None:
-            assert self.tok.type == TokenType.Semicolon, "';' expected"
-            self.next()
+    def root_statement(self) -> Node:
+        if self.tok.type is TokenType.Keyword:
+            handler = self._ROOT_DISPATCH.get(self.tok.value)
+            if handler is not None:
+                v = handler(self)
+                if self.tok.type is not TokenType.Semicolon:
+                    raise ParserException("';' expected")
+                self.next()
 
-            return v
+                return v
 
         return self.statement()
     
-    def use(self):
+    def use(self) -> UseNode:
         self.next()
 
         v: list[str] = []
         as_name: str | None = None
 
-        assert self.tok.type == TokenType.Identifier, "identifier expected"
+        if self.tok.type is not TokenType.Identifier:
+            raise ParserException("identifier expected")
         v.append(self.tok.value)
         self.next()
 
-        while self.tok.type == TokenType.Dot: # type: ignore
+        while self.tok.type is TokenType.Dot: # type: ignore
             self.next()
 
-            assert self.tok.type == TokenType.Identifier, "identifier expected"
+            if self.tok.type is not TokenType.Identifier:
+                raise ParserException("identifier expected")
             v.append(self.tok.value)
             self.next()
         
-        if self.tok.type == TokenType.Keyword and self.tok.value == Keyword.As: # type: ignore
+        if self.tok.type is TokenType.Keyword and self.tok.value is Keyword.As: # type: ignore
             self.next()
 
-            assert self.tok.type == TokenType.Identifier, "identifier expected"
+            if self.tok.type is not TokenType.Identifier:
+                raise ParserException("identifier expected")
             as_name = self.tok.value # type: ignore
             self.next()
         
@@ -159,236 +231,308 @@ class Parser:
         return UseNode(v, as_name)
 
 
-    def statement(self):
-        if self.tok.type == TokenType.Keyword:
-            if self.tok.value == Keyword.Return:
-                v = self.return_stmt()
-            elif self.tok.value == Keyword.For:
-                return self.for_stmt()
-            elif self.tok.value == Keyword.While:
-                return self.while_stmt()
-            else:
+    def statement(self) -> Node:
+        if self.tok.type is TokenType.Keyword:
+            handler = self._STATEMENT_DISPATCH.get(self.tok.value)
+            if handler is None:
                 raise NotImplementedError(f"Cannot process keyword {self.tok.value} in statement context")
+            return handler(self)
+
+        # expr
+        v: Node = self.expr()
+        if isinstance(v, DeclWrapNode):
+            return DiscardNode(v.value)
+        
+        v = DiscardNode(v)
+
+        if self.tok.type is TokenType.Assign:
+            self.next()
+            value = self.expr()
+            v = AssignNode(v.value, value)
         else:
-            # expr
-            v: Node = self.expr()
-            if isinstance(v, DeclWrapNode):
-                return DiscardNode(v.value)
-            
-            v = DiscardNode(v)
-
-            if self.tok.type == TokenType.Assign:
-                self.next()
-                value = self.expr()
-                v = AssignNode(v.value, value)
-            elif self.tok.type in (TokenType.InlineAdd, TokenType.InlineMul):
-                op = {
-                    TokenType.InlineAdd: BinOpType.Add,
-                    TokenType.InlineMul: BinOpType.Mul
-                }[self.tok.type]
+            op = _INLINE_OPS.get(self.tok.type)
+            if op is not None:
                 self.next()
                 value = self.expr()
                 v = AssignNode(v.value, BinOpNode(v.value, op, value))
 
-        assert self.tok.type == TokenType.Semicolon, "';' expected"
+        if self.tok.type is not TokenType.Semicolon:
+            raise ParserException("';' expected")
         self.next()
 
         return v
 
-    def return_stmt(self):
+    def return_stmt(self) -> ReturnNode:
         self.next()
-        if self.tok.type == TokenType.Semicolon:
-            return ReturnNode(None)
-        expr = self.expr()
-        return ReturnNode(expr)
+        if self.tok.type is TokenType.Semicolon:
+            v = ReturnNode(None)
+        else:
+            v = ReturnNode(self.expr())
+
+        if self.tok.type is not TokenType.Semicolon:
+            raise ParserException("';' expected")
+        self.next()
+
+        return v
     
-    def for_stmt(self):
+    def for_stmt(self) -> ForNode:
         self.next()
 
-        assert self.tok.type == TokenType.Identifier, "identifier expected"
+        if self.tok.type is not TokenType.Identifier:
+            raise ParserException("identifier expected")
         var_name = self.tok.value
         self.next()
 
-        assert self.tok.type == TokenType.Keyword and self.tok.value == Keyword.In, "'в' expected"
+        if self.tok.type is not TokenType.Keyword or self.tok.value is not Keyword.In:
+            raise ParserException("'в' expected")
         self.next()
 
         value = self.expr()
 
         body: list[Node] = []
-        while self.tok.value != Keyword.End: # type: ignore
+        while self.tok.value is not Keyword.End: # type: ignore
             body.append(self.statement())
         self.next()
 
         return ForNode(var_name, value, body)
     
-    def while_stmt(self):
+    def while_stmt(self) -> WhileNode:
         self.next()
 
         cond = self.expr()
         body: list[Node] = []
         
-        while self.tok.value != Keyword.End:
+        while self.tok.value is not Keyword.End:
             body.append(self.statement())
         self.next()
 
         return WhileNode(cond, body)
 
-    def module_decl(self):
+    def module_decl(self) -> ModuleDeclNode:
         self.next()
-        assert self.tok.type == TokenType.Identifier, "identifier expected"
+        if self.tok.type is not TokenType.Identifier:
+            raise ParserException("identifier expected")
 
         modname: list[str] = []
-        while self.tok.type == TokenType.Identifier:
+        while self.tok.type is TokenType.Identifier:
             modname.append(self.tok.value)
             self.next()
 
-            if self.tok.type == TokenType.Comma: # type: ignore
+            if self.tok.type is TokenType.Comma: # type: ignore
                 self.next()
                 continue
             break
 
         return ModuleDeclNode(modname)
 
-    def expr(self):
+    def expr(self) -> Node:
         return self.expr_compare()
     
-    def expr_compare(self):
+    def expr_compare(self) -> Node:
         v = self.expr_add()
-        while self.tok.value in (Keyword.LessThan,):
-            t = {
-                Keyword.LessThan: BinOpType.Lt
-            }[self.tok.value]
+        while True:
+            t = _CMP_OPS.get(self.tok.value)
+            if t is None:
+                break
             self.next()
-            v = BinOpNode(v, t, self.expr())
+            v = BinOpNode(v, t, self.expr_add())
 
         return v
     
     def expr_add(self) -> Node:
         v = self.expr_mul()
 
-        while self.tok.type in (TokenType.Plus,):
-            t = BinOpType.Add if self.tok.type == TokenType.Plus else BinOpType.Sub
+        while True:
+            t = _ADD_OPS.get(self.tok.type)
+            if t is None:
+                break
             self.next()
-            right = self.expr()
+            right = self.expr_mul()
             v = BinOpNode(v, t, right)
 
         return v
     
-    def expr_mul(self):
+    def expr_mul(self) -> Node:
         v = self.call()
 
-        while self.tok.type in (TokenType.Multiply,):
-            t = BinOpType.Mul if self.tok.type == TokenType.Multiply else BinOpType.Div
+        while True:
+            t = _MUL_OPS.get(self.tok.type)
+            if t is None:
+                break
             self.next()
-            right = self.expr()
+            right = self.call()
             v = BinOpNode(v, t, right)
 
         return v
     
-    def call(self):
+    def call(self) -> Node:
         v = self.attrs()
 
-        while self.tok.type == TokenType.ParenOpen:
+        while self.tok.type is TokenType.ParenOpen:
             self.next()
             args: list[Node] = []
-            while self.tok.type != TokenType.ParenClose: # pyright: ignore[reportUnnecessaryComparison]
+            while self.tok.type is not TokenType.ParenClose: # pyright: ignore[reportUnnecessaryComparison]
                 args.append(self.expr())
-                if self.tok.type == TokenType.ParenClose: # pyright: ignore[reportUnnecessaryComparison]
+                if self.tok.type is TokenType.ParenClose: # pyright: ignore[reportUnnecessaryComparison]
                     break
 
-                assert self.tok.type == TokenType.Comma, "',' expected"
+                if self.tok.type is not TokenType.Comma:
+                    raise ParserException("',' expected")
                 self.next()
             self.next()
 
             v = CallNode(v, args)
         return v
     
-    def attrs(self):
+    def attrs(self) -> Node:
         v = self.atom()
 
-        while self.tok.type == TokenType.Dot:
-            self.next()
+        tokens = self.tokens
+        tok = self.tok
+        try:
+            while tok.type is TokenType.Dot:
+                tok = next(tokens, EOF_TOKEN)
 
-            assert self.tok.type == TokenType.Identifier, "identifier expected"
-            v = AttrNode(v, self.tok.value)
-            self.next()
+                if tok.type is not TokenType.Identifier:
+                    raise ParserException("identifier expected")
+                v = AttrNode(v, tok.value)
+                tok = next(tokens, EOF_TOKEN)
+        finally:
+            self.tok = tok
 
         return v
     
     def atom(self) -> Node:
-        if self.tok.type in (TokenType.String, TokenType.Number):
-            v = ConstNode(self.tok.value)
-            self.next()
-            return v
-        elif self.tok.type == TokenType.ParenOpen:
-            self.next()
-            v = self.expr()
-            assert self.tok.type == TokenType.ParenClose, "')' expected"
-            self.next()
-            return v
-        elif self.tok.type == TokenType.Identifier:
-            v = IdenNode(self.tok.value)
-            self.next()
-            return v
-        elif self.tok.type == TokenType.Keyword:
-            if self.tok.value == Keyword.Proc:
-                return self.anon_proc([])
-        elif self.tok.type == TokenType.QuestionMark:
-            annos: list[Node] = []
-            while self.tok.type == TokenType.QuestionMark:
-                self.next()
-                annos.append(self.expr())
-            return self.anon_proc(annos)
-        elif self.tok.type == TokenType.Colon:
-            self.next()
+        handler = self._ATOM_DISPATCH.get(self.tok.type)
+        if handler is None:
+            raise ParserException(f"Unknown atom {self.tok}")
+        return handler(self)
+
+    def atom_const(self) -> ConstNode:
+        v = ConstNode(self.tok.value)
+        self.tok = next(self.tokens, EOF_TOKEN)
+        return v
 
-            assert self.tok.type == TokenType.Identifier, "identifier expected"
-            name = self.tok.value
-            self.next()
+    def atom_paren(self) -> Node:
+        self.next()
+        v = self.expr()
+        if self.tok.type is not TokenType.ParenClose:
+            raise ParserException("')' expected")
+        self.next()
+        return v
 
-            val = None
-            if self.tok.type == TokenType.Assign:
-                self.next()
-                val = self.expr()
+    def atom_iden(self) -> IdenNode:
+        v = IdenNode(self.tok.value)
+        self.tok = next(self.tokens, EOF_TOKEN)
+        return v
 
-            return TagNode(name, val)
+    def atom_keyword(self) -> Node:
+        if self.tok.value is Keyword.Proc:
+            return self.anon_proc([])
         raise ParserException(f"Unknown atom {self.tok}")
+
+    def atom_annotated(self) -> Node:
+        annos: list[Node] = []
+        while self.tok.type is TokenType.QuestionMark:
+            self.next()
+            annos.append(self.expr())
+        return self.anon_proc(annos)
+
+    def atom_tag(self) -> TagNode:
+        self.next()
+
+        if self.tok.type is not TokenType.Identifier:
+            raise ParserException("identifier expected")
+        name = self.tok.value
+        self.next()
+
+        val = None
+        if self.tok.type is TokenType.Assign:
+            self.next()
+            val = self.expr()
+
+        return TagNode(name, val)
     
-    def anon_proc(self, annotations: list[Node]):
-        assert self.tok.type == TokenType.Keyword and self.tok.value == Keyword.Proc, "procedure expected"
+    def anon_proc(self, annotations: list[Node]) -> Node:
+        if self.tok.type is not TokenType.Keyword or self.tok.value is not Keyword.Proc:
+            raise ParserException("procedure expected")
         self.next()
         
         proc_name: str | None = None
-        if self.tok.type == TokenType.Identifier: # type: ignore
+        if self.tok.type is TokenType.Identifier: # type: ignore
             proc_name = self.tok.value # type: ignore
             self.next()
 
-        assert self.tok.type == TokenType.ParenOpen, "'(' expected"
+        if self.tok.type is not TokenType.ParenOpen:
+            raise ParserException("'(' expected")
         self.next()
 
-        args: list[str] = []
-        while self.tok.type != TokenType.ParenClose: # type: ignore
-            assert self.tok.type == TokenType.Identifier, "identifier expected"
-            args.append(self.tok.value) # type: ignore
-            self.next()
-
-            if self.tok.type == TokenType.ParenClose:
-                break
+        args = self._scratch_args
+        args.clear()
+        tokens = self.tokens
+        tok = self.tok
+        try:
+            while tok.type is not TokenType.ParenClose:
+                if tok.type is not TokenType.Identifier:
+                    raise ParserException("identifier expected")
+                args.append(tok.value)
+                tok = next(tokens, EOF_TOKEN)
+
+                if tok.type is TokenType.ParenClose:
+                    break
 
-            assert self.tok.type == TokenType.Comma, "',' expected"
-            self.next()
+                if tok.type is not TokenType.Comma:
+                    raise ParserException("',' expected")
+                tok = next(tokens, EOF_TOKEN)
+        finally:
+            # keep the parser state in sync even when a check raises
+            self.tok = tok
         self.next()
+        # copied before the body: nested procedures reuse the buffer
+        params = tuple(args)
 
         body: list[Node] = []
-        while self.tok.value != Keyword.End: # type: ignore
+        while self.tok.value is not Keyword.End: # type: ignore
             body.append(self.statement())
         self.next()
 
-        decl_node = AnonProcDeclNode(args, body)
+        decl_node = AnonProcDeclNode(params, body)
         for i in reversed(annotations):
             decl_node = CallNode(i, [decl_node])
 
         if proc_name is not None:
             return DeclWrapNode(AssignAndReturnNode(IdenNode(proc_name), decl_node))
         return decl_node
-        
\ No newline at end of file
+
+    _ROOT_DISPATCH: dict[Keyword, Callable[["Parser"], Node]] = {
+        Keyword.Module: module_decl,
+        Keyword.Use: use
+    }
+    _STATEMENT_DISPATCH: dict[Keyword, Callable[["Parser"], Node]] = {
+        Keyword.Return: return_stmt,
+        Keyword.For: for_stmt,
+        Keyword.While: while_stmt
+    }
+    _ATOM_DISPATCH: dict[TokenType, Callable[["Parser"], Node]] = {
+        TokenType.String: atom_const,
+        TokenType.Number: atom_const,
+        TokenType.ParenOpen: atom_paren,
+        TokenType.Identifier: atom_iden,
+        TokenType.Keyword: atom_keyword,
+        TokenType.QuestionMark: atom_annotated,
+        TokenType.Colon: atom_tag
+    }
+
+_PARSE_CACHE: dict[bytes, list[Node]] = {}
+_PARSE_CACHE_SIZE = 64
+
+def parse_cached(source: str) -> list[Node]:
+    # identical sources share one AST; dict order doubles as the LRU order
+    key = hashlib.blake2b(source.encode(), digest_size=16).digest()
+    ast = _PARSE_CACHE.pop(key, None)
+    if ast is None:
+        ast = Parser().run(Lexer().iter(source))
+        if len(_PARSE_CACHE) >= _PARSE_CACHE_SIZE:
+            del _PARSE_CACHE[next(iter(_PARSE_CACHE))]
+    _PARSE_CACHE[key] = ast
+    return ast
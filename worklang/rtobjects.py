@@ -1,7 +1,10 @@
 import enum
-from typing import Any
+from typing import Any, Callable
 
 class Primitives(enum.Enum):
+    # see lexer.TokenType
+    __hash__ = object.__hash__
+
     Number = 1
     String = 2
     Bool = 3
@@ -10,20 +13,39 @@ class Primitives(enum.Enum):
     Nil = -67
 
 class WLObject:
+    __slots__ = ("object_type", "value")
+
     def __init__(self, object_type: Primitives, value: Any = None):
         self.object_type = object_type
         self.value = value
     def __eq__(self, other: 'WLObject | Any'):
-        if not isinstance(other, WLObject):
-            return False
-        if self.object_type != other.object_type:
-            return False
-        return self.value == other.value
+        return type(other) is WLObject and self.object_type is other.object_type and self.value == other.value
+    # equal objects may hold unhashable values
+    __hash__ = None # type: ignore
+    _REPR: dict[Primitives, Callable[[Any], str]] = {
+        Primitives.String: lambda v: v,
+        Primitives.Number: str,
+        Primitives.Bool: str,
+        Primitives.Nil: lambda v: "nil"
+    }
+
     def __repr__(self):
-        if self.object_type == Primitives.String:
-            return self.value
-        elif self.object_type == Primitives.Number:
-            return str(self.value)
-        else:
+        fn = self._REPR.get(self.object_type)
+        if fn is None:
             return repr(self.object_type)
-NIL = WLObject(Primitives.Nil)
\ No newline at end of file
+        return fn(self.value)
+
+    # objects are immutable, so common values are shared
+    @classmethod
+    def number(cls, n: int | float) -> 'WLObject':
+        if type(n) is int and -5 <= n <= 256:
+            return _SMALL_NUMBERS[n + 5]
+        return cls(Primitives.Number, n)
+    @classmethod
+    def bool(cls, b: bool) -> 'WLObject':
+        return TRUE if b else FALSE
+
+NIL = WLObject(Primitives.Nil)
+TRUE = WLObject(Primitives.Bool, True)
+FALSE = WLObject(Primitives.Bool, False)
+_SMALL_NUMBERS = [WLObject(Primitives.Number, i) for i in range(-5, 257)]
\ No newline at end of file
@@ -1,18 +1,22 @@
 import enum
 import importlib
-from typing import cast
+import struct
+from typing import Any, Callable, cast
 from .compiler import ConstEntry, Opcodes
 from .rtobjects import *
 
 class Runnable:
-    def __init__(self, module: 'WLModule', args: list[str], bytecode: bytes | bytearray):
+    __slots__ = ("module", "args", "bytecode", "code", "parent_scope")
+
+    def __init__(self, module: 'WLModule', args: list[str], bytecode: bytes | bytearray | memoryview):
         self.module = module
         self.args = args
-        self.bytecode = bytecode
+        self.bytecode: bytes | bytearray | memoryview | None = bytecode
+        self.code: list[Instruction] = []
         self.parent_scope: RunnableContext | None = None
 
     def __call__(self, executor: 'Executor', args: list[WLObject]):
-        ctx = RunnableContext(self.module, self.bytecode, self.parent_scope)
+        ctx = executor.new_ctx(self.module, self.code, self.parent_scope)
         assert len(args) == len(self.args)
         for my, given in zip(self.args, args):
             ctx.locals()[my] = given
@@ -20,17 +24,25 @@ class Runnable:
 
 ConstType = int | str | float | Runnable
 
+_DEFAULTS: dict[str, WLObject] | None = None
+
+def _stdlib_defaults() -> dict[str, WLObject]:
+    global _DEFAULTS
+    if _DEFAULTS is None:
+        # imported on first use: stdlib itself imports this module
+        _DEFAULTS = cast(dict[str, WLObject], importlib.import_module("worklang.stdlib").defaults)
+    return _DEFAULTS
+
 class WLModule:
+    __slots__ = ("name", "root_runnable", "constpool", "scope_version", "globals")
+
     def __init__(self, name: str, root_runnable: Runnable, constpool: list[ConstType]):
         self.name = name
         self.root_runnable = root_runnable
         self.constpool = constpool
-        self.globals: dict[str, WLObject] = {} | cast(dict[str, WLObject], importlib.import_module("worklang.stdlib").defaults)
-
-class ExecutorStepResult(enum.Enum):
-    CONTINUE = 1
-    END = 2
-    ASYNC_YIELD = 3
+        # bumped when a shared scope gains a name; invalidates GET caches
+        self.scope_version = 0
+        self.globals: dict[str, WLObject] = _stdlib_defaults().copy()
 
 class BinOperation(enum.Enum):
     ADD = 1
@@ -48,122 +60,376 @@ def operate_bi(left: WLObject, right: WLObject, op: BinOperation):
                 case BinOperation.MULTIPLY:
                     v = left.value * right.value
                 case BinOperation.LT:
-                    return WLObject(Primitives.Bool, left.value < right.value)
+                    return WLObject.bool(left.value < right.value)
                 case _:
                     raise NotImplementedError(f"unknown op {op}")
-            return WLObject(Primitives.Number, v)
+            return WLObject.number(v)
         case _:
             raise NotImplementedError(f"cannot operate on {left.object_type}")
 
+# Primitives.X is a slow enum attribute lookup; handlers use these
+_NUMBER = Primitives.Number
+_BOOL = Primitives.Bool
+_RUNNABLE = Primitives.Runnable
+
 class RunnableContext:
-    def __init__(self, module: WLModule, bytecode: bytearray | bytes, parent: 'RunnableContext | None'):
+    __slots__ = ("module", "localsx", "stack", "code", "pc", "parent", "scopes", "captured", "scope_version")
+
+    def __init__(self, module: WLModule, code: 'list[Instruction]', parent: 'RunnableContext | None'):
+        self.stack: list[WLObject] = []
+        self.reset(module, code, parent)
+
+    def reset(self, module: WLModule, code: 'list[Instruction]', parent: 'RunnableContext | None'):
         self.module = module
+        # always fresh: GET caches key on the scope list
         self.localsx: dict[str, WLObject] = {}
-        self.stack: list[WLObject] = []
-        self.bs = ByteStream(bytecode)
+        self.code = code
+        self.pc = 0
         self.parent: RunnableContext | None = parent
+        # own locals, enclosing contexts' locals, module globals
+        self.scopes: list[dict[str, WLObject]] = [self.localsx, *parent.scopes] if parent else [self.localsx, module.globals]
+        # closed over by a procedure: outlives its call, never pooled
+        self.captured = False
+        # for names added while no other context can see this one
+        self.scope_version = 0
     
+    def release(self):
+        self.stack.clear()
+        self.localsx.clear()
+        self.scopes.clear()
+        self.parent = None
+
     def has(self, name: str):
-        if name in self.locals():
-            return True
-        if self.parent and self.parent.has(name):
-            return True
-        return name in self.module.globals
+        for scope in self.scopes:
+            if name in scope:
+                return True
+        return False
+
+    def scope_of(self, name: str) -> dict[str, WLObject]:
+        for scope in self.scopes:
+            if name in scope:
+                return scope
+        return self.module.globals
 
     def get(self, name: str) -> WLObject:
-        if name in self.locals():
-            return self.locals()[name]
-        if self.parent and self.parent.has(name):
-            return self.parent.get(name)
-        return self.module.globals[name]
+        return self.scope_of(name)[name]
 
     def globals(self):
         return self.module.globals
     def locals(self):
         return self.localsx
 
-    def step(self, executor: 'Executor', vm: 'VM') -> tuple[ExecutorStepResult, WLObject | None]:
-        if self.bs.over():
-            return ExecutorStepResult.END, NIL
-        opcode = self.bs.byte()
+# handlers return True once a different context is on top of the executor
 
-        
-        if opcode == Opcodes.NOP:
-            pass
-        elif opcode == Opcodes.PUSH_CONST:
-            ptr = self.bs.int32()
-            raw_obj = self.module.constpool[ptr]
-            if isinstance(raw_obj, str):
-                self.stack.append(WLObject(Primitives.String, raw_obj))
-            elif isinstance(raw_obj, int):
-                self.stack.append(WLObject(Primitives.Number, raw_obj))
-            elif isinstance(raw_obj, Runnable):
-                self.stack.append(WLObject(Primitives.Runnable, raw_obj))
-            else:
-                raise NotImplementedError(f"Unknown raw object type {raw_obj}")
-        elif opcode == Opcodes.SET:
-            ptr = self.bs.int32()
-            val = self.stack.pop()
-            self.locals()[cast(str, self.module.constpool[ptr])] = val
-        elif opcode == Opcodes.GET:
-            ptr = self.bs.int32()
-            iden = self.module.constpool[ptr]
-
-            assert isinstance(iden, str)
-            self.stack.append(executor.ctx().get(iden))
-        elif opcode == Opcodes.INVOKE:
-            argcount = self.bs.int16()
-            callee = self.stack.pop()
-
-            args: list[WLObject] = []
-            for _ in range(argcount):
-                args.insert(0, self.stack.pop())
-            
-            assert callee.object_type == Primitives.Runnable
-            self.stack.append(callee.value(executor, args)) # type: ignore
-        elif opcode == Opcodes.DISCARD:
-            self.stack.pop()
-        elif opcode == Opcodes.MULTIPLY:
-            right = self.stack.pop()
-            left = self.stack.pop()
-            self.stack.append(operate_bi(left, right, BinOperation.MULTIPLY))
-        elif opcode == Opcodes.ADD:
-            right = self.stack.pop()
-            left = self.stack.pop()
-            self.stack.append(operate_bi(left, right, BinOperation.ADD))
-        elif opcode == Opcodes.RETURN:
-            return ExecutorStepResult.END, self.stack.pop()
-        elif opcode == Opcodes.INJECT_PARENT_SCOPE:
-            v = self.stack[-1]
-            assert v.object_type == Primitives.Runnable
-            r: Runnable = v.value
-            r.parent_scope = self
-        elif opcode == Opcodes.LOGICNOT:
-            v = self.stack.pop()
-            assert v.object_type == Primitives.Bool
-            self.stack.append(WLObject(Primitives.Bool, not v.value)) # type: ignore
-        elif opcode == Opcodes.JMP_IF:
-            cond = self.stack.pop()
-            reladdr = self.bs.int32_sign()
-
-            assert cond.object_type == Primitives.Bool
-            if cond.value:
-                self.bs.idx += reladdr
-        elif opcode == Opcodes.JMP:
-            reladdr = self.bs.int32_sign()
-            self.bs.idx += reladdr
-        elif opcode == Opcodes.LESSTHAN:
-            right = self.stack.pop()
-            left = self.stack.pop()
-            self.stack.append(operate_bi(left, right, BinOperation.LT))
+def _op_nop(ctx: RunnableContext, executor: 'Executor', arg: Any):
+    pass
+
+def _op_push_const(ctx: RunnableContext, executor: 'Executor', obj: WLObject):
+    ctx.stack.append(obj)
+
+def _op_set(ctx: RunnableContext, executor: 'Executor', name: str):
+    localsx = ctx.localsx
+    if name not in localsx:
+        if ctx.captured or ctx.parent is None:
+            ctx.module.scope_version += 1
         else:
-            raise NotImplementedError(f"Unknown opcode {hex(opcode)}")
-        return ExecutorStepResult.CONTINUE, None
+            ctx.scope_version += 1
+    localsx[name] = ctx.stack.pop()
+
+# GET's operand is its inline cache:
+# [name, scopes, module scope_version, context scope_version, scope]
+def _op_get(ctx: RunnableContext, executor: 'Executor', cache: list[Any]):
+    if cache[1] is ctx.scopes and cache[2] == ctx.module.scope_version and cache[3] == ctx.scope_version:
+        ctx.stack.append(cache[4][cache[0]])
+        return
+    name = cache[0]
+    scope = ctx.scope_of(name)
+    ctx.stack.append(scope[name])
+    cache[1] = ctx.scopes
+    cache[2] = ctx.module.scope_version
+    cache[3] = ctx.scope_version
+    cache[4] = scope
+
+def _op_invoke(ctx: RunnableContext, executor: 'Executor', argcount: int):
+    stack = ctx.stack
+    callee = stack.pop()
+
+    if argcount:
+        args = stack[-argcount:]
+        del stack[-argcount:]
+    else:
+        args: list[WLObject] = []
+    
+    assert callee.object_type is _RUNNABLE
+    stack.append(callee.value(executor, args)) # type: ignore
+    if executor.ctx_stack[-1] is not ctx:
+        return True
+
+def _op_discard(ctx: RunnableContext, executor: 'Executor', arg: Any):
+    ctx.stack.pop()
+
+# ADD/MULTIPLY count number-number runs in [hits] and then rewrite their
+# slot to the number-only form, which reverts on the first mismatch
+_SPECIALIZE_AFTER = 50
+
+def _op_multiply(ctx: RunnableContext, executor: 'Executor', hits: list[int]):
+    stack = ctx.stack
+    right = stack.pop()
+    left = stack[-1]
+    if left.object_type is _NUMBER and right.object_type is _NUMBER:
+        hits[0] += 1
+        if hits[0] >= _SPECIALIZE_AFTER:
+            ctx.code[ctx.pc - 1] = (_op_multiply_num_num, hits)
+    else:
+        hits[0] = 0
+    stack[-1] = operate_bi(left, right, BinOperation.MULTIPLY)
+
+def _op_multiply_num_num(ctx: RunnableContext, executor: 'Executor', hits: list[int]):
+    stack = ctx.stack
+    right = stack.pop()
+    left = stack[-1]
+    if left.object_type is _NUMBER and right.object_type is _NUMBER:
+        stack[-1] = WLObject.number(left.value * right.value)
+        return
+    hits[0] = 0
+    ctx.code[ctx.pc - 1] = (_op_multiply, hits)
+    stack[-1] = operate_bi(left, right, BinOperation.MULTIPLY)
+
+def _op_add(ctx: RunnableContext, executor: 'Executor', hits: list[int]):
+    stack = ctx.stack
+    right = stack.pop()
+    left = stack[-1]
+    if left.object_type is _NUMBER and right.object_type is _NUMBER:
+        hits[0] += 1
+        if hits[0] >= _SPECIALIZE_AFTER:
+            ctx.code[ctx.pc - 1] = (_op_add_num_num, hits)
+    else:
+        hits[0] = 0
+    stack[-1] = operate_bi(left, right, BinOperation.ADD)
+
+def _op_add_num_num(ctx: RunnableContext, executor: 'Executor', hits: list[int]):
+    stack = ctx.stack
+    right = stack.pop()
+    left = stack[-1]
+    if left.object_type is _NUMBER and right.object_type is _NUMBER:
+        stack[-1] = WLObject.number(left.value + right.value)
+        return
+    hits[0] = 0
+    ctx.code[ctx.pc - 1] = (_op_add, hits)
+    stack[-1] = operate_bi(left, right, BinOperation.ADD)
+
+def _op_return(ctx: RunnableContext, executor: 'Executor', arg: Any):
+    executor.finish(ctx.stack.pop())
+    return True
+
+def _op_halt(ctx: RunnableContext, executor: 'Executor', arg: Any):
+    executor.finish(NIL)
+    return True
+
+def _op_inject_parent_scope(ctx: RunnableContext, executor: 'Executor', arg: Any):
+    v = ctx.stack[-1]
+    assert v.object_type is _RUNNABLE
+    r: Runnable = v.value
+    r.parent_scope = ctx
+    ctx.captured = True
+
+def _op_logicnot(ctx: RunnableContext, executor: 'Executor', arg: Any):
+    stack = ctx.stack
+    v = stack[-1]
+    assert v.object_type is _BOOL
+    stack[-1] = FALSE if v.value else TRUE
+
+def _op_jmp_if(ctx: RunnableContext, executor: 'Executor', target: int):
+    cond = ctx.stack.pop()
+
+    assert cond.object_type is _BOOL
+    if cond.value:
+        ctx.pc = target
+
+def _op_jmp(ctx: RunnableContext, executor: 'Executor', target: int):
+    ctx.pc = target
+
+def _op_lessthan(ctx: RunnableContext, executor: 'Executor', arg: Any):
+    stack = ctx.stack
+    right = stack.pop()
+    left = stack[-1]
+    if left.object_type is _NUMBER and right.object_type is _NUMBER:
+        stack[-1] = TRUE if left.value < right.value else FALSE
+    else:
+        stack[-1] = operate_bi(left, right, BinOperation.LT)
+
+# superinstructions, produced only by quicken()
+def _op_add_const(ctx: RunnableContext, executor: 'Executor', right: WLObject):
+    stack = ctx.stack
+    left = stack[-1]
+    if left.object_type is _NUMBER:
+        stack[-1] = WLObject.number(left.value + right.value)
+    else:
+        stack[-1] = operate_bi(left, right, BinOperation.ADD)
+
+def _op_multiply_const(ctx: RunnableContext, executor: 'Executor', right: WLObject):
+    stack = ctx.stack
+    left = stack[-1]
+    if left.object_type is _NUMBER:
+        stack[-1] = WLObject.number(left.value * right.value)
+    else:
+        stack[-1] = operate_bi(left, right, BinOperation.MULTIPLY)
+
+def _op_lessthan_const(ctx: RunnableContext, executor: 'Executor', right: WLObject):
+    stack = ctx.stack
+    left = stack[-1]
+    if left.object_type is _NUMBER:
+        stack[-1] = TRUE if left.value < right.value else FALSE
+    else:
+        stack[-1] = operate_bi(left, right, BinOperation.LT)
+
+def _op_jmp_unless(ctx: RunnableContext, executor: 'Executor', target: int):
+    cond = ctx.stack.pop()
+
+    assert cond.object_type is _BOOL
+    if not cond.value:
+        ctx.pc = target
+
+def _op_unknown(ctx: RunnableContext, executor: 'Executor', opcode: int):
+    raise NotImplementedError(f"Unknown opcode {hex(opcode)}")
+
+Handler = Callable[[RunnableContext, 'Executor', Any], bool | None]
+Instruction = tuple[Handler, Any]
+
+# indexed by the opcode byte
+HANDLERS: list[Handler] = [_op_unknown] * 256
+HANDLERS[Opcodes.NOP] = _op_nop
+HANDLERS[Opcodes.PUSH_CONST] = _op_push_const
+HANDLERS[Opcodes.SET] = _op_set
+HANDLERS[Opcodes.GET] = _op_get
+HANDLERS[Opcodes.INVOKE] = _op_invoke
+HANDLERS[Opcodes.DISCARD] = _op_discard
+HANDLERS[Opcodes.MULTIPLY] = _op_multiply
+HANDLERS[Opcodes.ADD] = _op_add
+HANDLERS[Opcodes.RETURN] = _op_return
+HANDLERS[Opcodes.HALT] = _op_halt
+HANDLERS[Opcodes.INJECT_PARENT_SCOPE] = _op_inject_parent_scope
+HANDLERS[Opcodes.LOGICNOT] = _op_logicnot
+HANDLERS[Opcodes.JMP_IF] = _op_jmp_if
+HANDLERS[Opcodes.JMP] = _op_jmp
+HANDLERS[Opcodes.LESSTHAN] = _op_lessthan
+
+# operand bytes after each opcode, including ones the VM does not implement
+OPERAND_WIDTHS: list[int] = [0] * 256
+OPERAND_WIDTHS[Opcodes.PUSH_CONST] = 4
+OPERAND_WIDTHS[Opcodes.GET] = 4
+OPERAND_WIDTHS[Opcodes.SET_GLOBAL] = 4
+OPERAND_WIDTHS[Opcodes.SET] = 4
+OPERAND_WIDTHS[Opcodes.INVOKE] = 2
+OPERAND_WIDTHS[Opcodes.GETATTR] = 4
+OPERAND_WIDTHS[Opcodes.JMP] = 4
+OPERAND_WIDTHS[Opcodes.JMP_IF] = 4
+
+_JUMP_HANDLERS = {_op_jmp, _op_jmp_if, _op_jmp_unless}
+# PUSH_CONST <number> followed by one of these becomes a single instruction
+_CONST_FUSIONS = {_op_add: _op_add_const, _op_multiply: _op_multiply_const, _op_lessthan: _op_lessthan_const}
+
+def _fuse(first: Instruction, second: Instruction) -> Instruction | None:
+    if first[0] is _op_push_const and first[1].object_type is _NUMBER:
+        fused = _CONST_FUSIONS.get(second[0])
+        if fused is not None:
+            return fused, first[1]
+    elif first[0] is _op_logicnot and second[0] is _op_jmp_if:
+        return _op_jmp_unless, second[1]
+    return None
+
+def wrap_const(raw_obj: ConstType) -> WLObject:
+    # boxed once at load time
+    if isinstance(raw_obj, str):
+        return WLObject(Primitives.String, raw_obj)
+    elif isinstance(raw_obj, int):
+        return WLObject.number(raw_obj)
+    elif isinstance(raw_obj, Runnable):
+        return WLObject(Primitives.Runnable, raw_obj)
+    raise NotImplementedError(f"Unknown raw object type {raw_obj}")
+
+def quicken(bytecode: bytearray | bytes | memoryview, constpool: list[ConstType]) -> list[Instruction]:
+    # decoded once into (handler, operand) pairs; jumps become instruction indices
+    PUSH_CONST, SET, GET, INVOKE, ADD, MULTIPLY, JMP, JMP_IF = Opcodes.PUSH_CONST, Opcodes.SET, Opcodes.GET, Opcodes.INVOKE, Opcodes.ADD, Opcodes.MULTIPLY, Opcodes.JMP, Opcodes.JMP_IF
+    handlers = HANDLERS
+    bs = ByteStream(bytecode)
+    raw: list[Instruction] = []
+    offsets: dict[int, int] = {}
+    jumps: list[int] = []
+    while not bs.over():
+        offsets[bs.idx] = len(raw)
+        opcode = bs.byte()
+        handler = handlers[opcode]
+        arg: Any = None
+        if opcode == PUSH_CONST:
+            arg = wrap_const(constpool[bs.int32()])
+        elif opcode == SET:
+            arg = cast(str, constpool[bs.int32()])
+        elif opcode == GET:
+            arg = [cast(str, constpool[bs.int32()]), None, -1, -1, None]
+        elif opcode == INVOKE:
+            arg = bs.int16()
+        elif opcode == ADD or opcode == MULTIPLY:
+            arg = [0]
+        elif opcode == JMP or opcode == JMP_IF:
+            reladdr = bs.int32_sign()
+            arg = bs.idx + reladdr
+            jumps.append(len(raw))
+        elif handler is _op_unknown:
+            arg = opcode
+            bs.idx += OPERAND_WIDTHS[opcode]
+        raw.append((handler, arg))
+    offsets[bs.idx] = len(raw)
+
+    targets: set[int] = set()
+    for i in jumps:
+        target = raw[i][1]
+        assert target in offsets, f"Jump into the middle of an instruction at {target}"
+        raw[i] = (raw[i][0], offsets[target])
+        targets.add(offsets[target])
+
+    # fuse pairs unless something jumps between the halves
+    code: list[Instruction] = []
+    remap: list[int] = [0] * (len(raw) + 1)
+    i = 0
+    while i < len(raw):
+        remap[i] = len(code)
+        instr = raw[i]
+        if i + 1 < len(raw) and i + 1 not in targets:
+            fused = _fuse(instr, raw[i + 1])
+            if fused is not None:
+                remap[i + 1] = len(code)
+                code.append(fused)
+                i += 2
+                continue
+        code.append(instr)
+        i += 1
+    remap[len(raw)] = len(code)
+    # running off the end halts, so pc needs no bounds check
+    code.append((_op_halt, None))
+
+    for i, (handler, arg) in enumerate(code):
+        if handler in _JUMP_HANDLERS:
+            code[i] = (handler, remap[arg])
+    return code
+
+CTX_POOL_SIZE = 32
 
 class Executor:
+    __slots__ = ("ctx_stack", "vm", "ctx_pool")
+
     def __init__(self, vm: 'VM'):
         self.ctx_stack: list[RunnableContext] = []
         self.vm = vm
+        # finished contexts, reused by the next call
+        self.ctx_pool: list[RunnableContext] = []
+
+    def new_ctx(self, module: WLModule, code: 'list[Instruction]', parent: RunnableContext | None):
+        if self.ctx_pool:
+            ctx = self.ctx_pool.pop()
+            ctx.reset(module, code, parent)
+            return ctx
+        return RunnableContext(module, code, parent)
 
     def push_ctx(self, ctx: RunnableContext):
         self.ctx_stack.append(ctx)
@@ -172,45 +438,55 @@ class Executor:
     def ctx(self):
         return self.ctx_stack[-1]
 
-    def step(self, vm: 'VM'):
-        r, v = self.ctx().step(self, vm)
-        if r == ExecutorStepResult.CONTINUE:
-            return r
-        elif r == ExecutorStepResult.END:
-            self.pop_ctx()
-
-            assert v is not None
-            if len(self.ctx_stack) > 0:
-                self.ctx().stack.append(v)
-                return ExecutorStepResult.CONTINUE
-            return ExecutorStepResult.END
-        else:
-            raise NotImplementedError("asdf")
+    def finish(self, v: WLObject):
+        ctx = self.pop_ctx()
+        if len(self.ctx_stack) > 0:
+            self.ctx().stack.append(v)
+        if not ctx.captured and len(self.ctx_pool) < CTX_POOL_SIZE:
+            ctx.release()
+            self.ctx_pool.append(ctx)
+
+    def run(self):
+        ctx_stack = self.ctx_stack
+        while ctx_stack:
+            ctx = ctx_stack[-1]
+            code = ctx.code
+            while True:
+                pc = ctx.pc
+                handler, arg = code[pc]
+                ctx.pc = pc + 1
+                if handler(ctx, self, arg):
+                    break
+
+_U16 = struct.Struct(">H").unpack_from
+_U32 = struct.Struct(">I").unpack_from
+_I32 = struct.Struct(">i").unpack_from
 
 class ByteStream:
 
-    def __init__(self, arr: bytearray | bytes):
-        self.arr = arr
+    def __init__(self, arr: bytearray | bytes | memoryview):
+        # unsigned bytes, so indexing yields ints for any buffer type
+        self.arr = memoryview(arr).cast("B")
         self.idx = 0
     def byte(self):
         val = self.arr[self.idx]
         self.idx += 1
         return val
     def int16(self):
-        val = int.from_bytes(self.arr[self.idx:self.idx+2], "big")
+        val = _U16(self.arr, self.idx)[0]
         self.idx += 2
         return val
     def int32(self):
-        val = int.from_bytes(self.arr[self.idx:self.idx+4], "big")
+        val = _U32(self.arr, self.idx)[0]
         self.idx += 4
         return val
     def int32_sign(self):
-        val = int.from_bytes(self.arr[self.idx:self.idx+4], "big", signed=True)
+        val = _I32(self.arr, self.idx)[0]
         self.idx += 4
         return val
     def str(self):
         length = self.int32()
-        val = self.arr[self.idx:self.idx+length].decode("utf-8")
+        val = str(self.arr[self.idx:self.idx+length], "utf-8")
         self.idx += length
         return val
     def bytes(self, amt: int):
@@ -219,7 +495,9 @@ class ByteStream:
         return val
     def varint(self):
         amt = self.byte()
-        return int.from_bytes(self.bytes(amt), "big", signed=True)
+        val = int.from_bytes(self.arr[self.idx:self.idx+amt], "big", signed=True)
+        self.idx += amt
+        return val
     def over(self):
         return self.idx >= len(self.arr)
 
@@ -270,6 +548,12 @@ class VM:
             else:
                 raise NotImplementedError(f"Unknown const pool entry {typ}")
         
+        for entry in const_pool:
+            if isinstance(entry, Runnable):
+                entry.code = quicken(cast(memoryview, entry.bytecode), const_pool)
+                # a view into the module image, which must not stay pinned
+                entry.bytecode = None
+
         bytecode_runnable_id = s.int32()
         module.root_runnable = cast(Runnable, const_pool[bytecode_runnable_id])
         
@@ -287,20 +571,11 @@ class VM:
             return self.module_cache[name]
         
         mod = self.load_from_bytes(self.get_module_source(name))
-        ctx = RunnableContext(mod, mod.root_runnable.bytecode, None)
+        ctx = RunnableContext(mod, mod.root_runnable.code, None)
 
         executor = Executor(self)
         executor.push_ctx(ctx)
 
         self.executor_stack.append(executor)
-        while True:
-            if len(self.executor_stack) == 0:
-                break
-            ex = self.executor_stack[-1]
-            res = ex.step(self)
-            if res == ExecutorStepResult.CONTINUE:
-                pass
-            elif res == ExecutorStepResult.END:
-                self.executor_stack.pop()
-            else:
-                raise NotImplementedError(f"Step {res}")
+        executor.run()
+        self.executor_stack.pop()